@@ -1,7 +1,6 @@
 use crate::audit_file::AuditFile;
 
-use std::fs::File;
-use std::io::Read;
+use std::fs;
 use std::path::Path;
 
 use anyhow::Result;
@@ -16,10 +15,32 @@ where
     for entry in WalkDir::new(&p).sort_by_file_name() {
         match entry {
             Ok(ne) if ne.path().is_file() => {
-                let mut file = File::open(ne.path())?;
-                let mut buf = Vec::new();
-                file.read_to_end(&mut buf)?;
-                hasher.update(buf);
+                hasher.update(fs::read(ne.path())?);
+            }
+            _ => (),
+        }
+    }
+
+    Ok(hasher.finalize().into())
+}
+
+/// Like hash_dir, but also hashes each file's path relative to the directory,
+/// so that renaming or moving a file changes the hash
+pub fn hash_dir_with_paths<P>(p: P) -> Result<[u8; 32]>
+where
+    P: AsRef<Path>,
+{
+    let mut hasher = Sha256::new();
+    for entry in WalkDir::new(&p).sort_by_file_name() {
+        match entry {
+            Ok(ne) if ne.path().is_file() => {
+                // Length-prefix the path and the contents so they can't run together
+                let rel_path = ne.path().strip_prefix(&p)?.to_string_lossy();
+                hasher.update((rel_path.len() as u64).to_le_bytes());
+                hasher.update(rel_path.as_bytes());
+                let contents = fs::read(ne.path())?;
+                hasher.update((contents.len() as u64).to_le_bytes());
+                hasher.update(contents);
             }
             _ => (),
         }
@@ -1,14 +1,15 @@
 //! Run a scan for a list of crates in parallel.
 
-use cargo_scan::effect::EffectInstance;
+use cargo_scan::auditing::util::hash_dir_with_paths;
+use cargo_scan::effect::{EffectInstance, DEFAULT_EFFECT_TYPES};
 use cargo_scan::scan_stats::{self, CrateStats};
 use cargo_scan::util;
 
 use clap::Parser;
 use log::{debug, error, info, warn};
-use std::collections::HashMap;
-use std::fs;
-use std::io::Write;
+use std::collections::{HashMap, HashSet};
+use std::fs::{self, File};
+use std::io::{BufWriter, Write};
 use std::path::{Path, PathBuf};
 use std::process::Command;
 use std::sync::mpsc;
@@ -35,6 +36,12 @@ const RESULTS_METADATA_SUFFIX: &str = "_metadata.csv";
 // Whether to remove and re-download old downloaded packages
 const UPDATE_DOWNLOADS: bool = false;
 
+// Number of crates to download at once
+const DOWNLOAD_THREADS: usize = 16;
+
+// Cached per-crate results (see --cache)
+const CACHE_DIR: &str = "data/.scan-cache";
+
 /*
     CLI
 */
@@ -63,42 +70,114 @@ struct Args {
     // Don't collect raw list of effects
     #[clap(long, default_value_t = false)]
     skip_raw: bool,
+
+    /// Reuse saved results for crates whose source has not changed.
+    /// Note that cached results do not reflect changes to the scanner itself.
+    #[clap(long, default_value_t = false)]
+    cache: bool,
+}
+
+/*
+    Names of the crates already present in the download location, read with a
+    single directory listing instead of one stat per crate
+*/
+fn downloaded_crates(download_loc: &Path) -> HashSet<String> {
+    fs::read_dir(download_loc)
+        .expect("Failed to read download location")
+        .filter_map(util::iter::warn_ok)
+        .filter(|entry| {
+            // file_type does not follow symlinks, so resolve those separately
+            entry.file_type().map_or(false, |t| {
+                t.is_dir() || (t.is_symlink() && entry.path().is_dir())
+            })
+        })
+        .filter_map(|entry| entry.file_name().into_string().ok())
+        .collect()
 }
 
 /*
-    Wrapper for scan_stats::get_crate_stats_default
+    Download a crate with cargo download, unless it is already present
+*/
+fn download_crate(crt: &str, output_dir: &Path, downloaded: bool) {
+    if UPDATE_DOWNLOADS && downloaded {
+        fs::remove_dir_all(output_dir).expect("failed to remove old dir");
+    }
+
+    if UPDATE_DOWNLOADS || !downloaded {
+        info!("Downloading {} to: {:?}", crt, output_dir);
+
+        let _output = Command::new("cargo")
+            .arg("download")
+            .arg("-x")
+            .arg(crt)
+            .arg("-o")
+            .arg(output_dir)
+            .output()
+            .expect("failed to run cargo download");
+    }
+
+    debug!("Downloaded");
+}
+
+/*
+    Cache of per-crate results, keyed by a hash of the crate's source files
+    and their paths
+*/
+fn cached_stats_path(crt: &str, crate_dir: &Path, quick_mode: bool) -> Option<PathBuf> {
+    let hash = util::iter::warn_ok(hash_dir_with_paths(crate_dir))?;
+    let hash: String = hash.iter().map(|b| format!("{:02x}", b)).collect();
+    let mode = if quick_mode { "quick" } else { "full" };
+    Some(Path::new(CACHE_DIR).join(format!("{}-{}-{}.json", crt, mode, hash)))
+}
+
+fn load_cached(path: &Path, crate_dir: &Path) -> Option<CrateStats> {
+    let json = fs::read_to_string(path).ok()?;
+    let stats: CrateStats = util::iter::warn_ok(serde_json::from_str(&json))?;
+    // Effect locations include the crate path, so only reuse results from the
+    // same download location
+    (stats.crate_path == crate_dir).then_some(stats)
+}
+
+fn save_cached(path: &Path, stats: &CrateStats) {
+    if let Some(json) = util::iter::warn_ok(serde_json::to_string(stats)) {
+        util::iter::warn_ok(fs::write(path, json));
+    }
+}
+
+/*
+    Wrapper for scan_stats::get_crate_stats, with optional caching
 */
 fn crate_stats(
     crt: &str,
-    download_loc: PathBuf,
-    test_run: bool,
+    output_dir: PathBuf,
     quick_mode: bool,
+    use_cache: bool,
 ) -> CrateStats {
     info!("Getting stats for: {}", crt);
-    let output_dir = download_loc.join(Path::new(crt));
 
-    if !test_run {
-        if UPDATE_DOWNLOADS {
-            fs::remove_dir_all(&output_dir).expect("failed to remove old dir");
-        }
-
-        if !output_dir.is_dir() {
-            info!("Downloading {} to: {:?}", crt, output_dir);
-
-            let _output = Command::new("cargo")
-                .arg("download")
-                .arg("-x")
-                .arg(crt)
-                .arg("-o")
-                .arg(&output_dir)
-                .output()
-                .expect("failed to run cargo download");
-        }
+    let cache_path =
+        if use_cache { cached_stats_path(crt, &output_dir, quick_mode) } else { None };
+    if let Some(stats) =
+        cache_path.as_deref().and_then(|path| load_cached(path, &output_dir))
+    {
+        info!("Using cached results for: {}", crt);
+        return stats;
     }
 
-    debug!("Downloaded");
-
-    let stats = scan_stats::get_crate_stats_default(output_dir, quick_mode);
+    let stats = match scan_stats::get_crate_stats(
+        output_dir.clone(),
+        DEFAULT_EFFECT_TYPES,
+        quick_mode,
+    ) {
+        Ok(stats) => {
+            // Only successful scans are cached
+            if let Some(path) = &cache_path {
+                save_cached(path, &stats);
+            }
+            stats
+        }
+        Err(_) => scan_stats::crashed_crate_stats(output_dir),
+    };
 
     // dbg!(&stats);
     info!("Done scanning: {}", crt);
@@ -115,6 +194,10 @@ struct AllStats {
     crate_stats: HashMap<String, CrateStats>,
     patterns: HashMap<String, usize>,
     crate_patterns: HashMap<String, HashMap<String, usize>>,
+    // Raw effect list output, written in crate order while the scan runs
+    raw_out: Option<BufWriter<File>>,
+    // Index in crates of the next crate whose effects are due to be written
+    next_raw: usize,
 }
 
 impl AllStats {
@@ -133,41 +216,80 @@ impl AllStats {
     }
 
     fn push_stats(&mut self, crt: String, c: CrateStats) {
+        // Count patterns for this crate locally, then merge into the totals
+        // once per pattern rather than once per effect. Counting is keyed by
+        // the pattern strings borrowed from the effects, so an owned string is
+        // only allocated once per distinct pattern.
+        let mut counts: HashMap<&str, usize> = HashMap::new();
         for eff in &c.effects {
-            let pat = eff.eff_type().to_csv();
-            *self.patterns.entry(pat.clone()).or_default() += 1;
-            *self
-                .crate_patterns
-                .entry(crt.clone())
-                .or_default()
-                .entry(pat)
-                .or_default() += 1;
+            *counts.entry(eff.eff_type().simple_str()).or_default() += 1;
+        }
+        let mut crate_patterns: HashMap<String, usize> = HashMap::new();
+        for (pat, count) in counts {
+            *crate_patterns
+                .entry(util::csv::sanitize_comma(pat).into_owned())
+                .or_default() += count;
+        }
+        for (pat, count) in &crate_patterns {
+            match self.patterns.get_mut(pat) {
+                Some(total) => *total += count,
+                None => {
+                    self.patterns.insert(pat.clone(), *count);
+                }
+            }
         }
+        self.crate_patterns.insert(crt.clone(), crate_patterns);
         if let Some(x) = self.crate_stats.insert(crt, c) {
             warn!("Crate stats already present in map, overwriting: {:?}", x);
         }
+        self.write_raw(false);
     }
 
-    fn dump_all(&mut self, path: &Path) {
+    fn start_raw(&mut self, path: &Path) {
         let mut f = util::fs::path_writer(path);
         writeln!(f, "{}", EffectInstance::csv_header()).unwrap();
-        for crt in &self.crates {
-            let stats = Self::get_stats(&mut self.crate_stats, crt.clone());
-            for eff in &stats.effects {
-                writeln!(f, "{}", eff.to_csv()).unwrap();
+        self.raw_out = Some(f);
+    }
+
+    /// Write out the effects of each crate in order, up to the first crate
+    /// that is still being scanned (or all of them, once the scan is finished).
+    /// Effects are dropped once written rather than held until the end.
+    fn write_raw(&mut self, finished: bool) {
+        while let Some(crt) = self.crates.get(self.next_raw) {
+            let stats = if finished {
+                Self::get_stats(&mut self.crate_stats, crt.clone())
+            } else {
+                match self.crate_stats.get_mut(crt) {
+                    Some(stats) => stats,
+                    None => break,
+                }
+            };
+            if let Some(f) = self.raw_out.as_mut() {
+                for eff in &stats.effects {
+                    writeln!(f, "{}", eff.to_csv()).unwrap();
+                }
             }
+            stats.effects = Vec::new();
+            self.next_raw += 1;
+        }
+    }
+
+    fn finish_raw(&mut self) {
+        self.write_raw(true);
+        if let Some(mut f) = self.raw_out.take() {
+            f.flush().unwrap();
         }
     }
 
-    fn dump_summary(&mut self, path: &Path) {
+    fn dump_summary(&self, path: &Path) {
         let mut f = util::fs::path_writer(path);
         writeln!(f, "crate, effects").unwrap();
-        let mut crates_total: Vec<(String, usize)> = self
+        // Crates without stats (e.g. due to a crash) count as zero effects
+        let mut crates_total: Vec<(&str, usize)> = self
             .crates
             .iter()
             .map(|k| {
-                let stats = Self::get_stats(&mut self.crate_stats, k.to_string());
-                (k.to_string(), stats.effects.len())
+                (k.as_str(), self.crate_stats.get(k).map_or(0, |stats| stats.num_effects))
             })
             .filter(|(_, v)| *v != 0)
             .collect();
@@ -179,7 +301,7 @@ impl AllStats {
 
     fn dump_patterns(&self, path: &Path) {
         let mut f = util::fs::path_writer(path);
-        let mut patterns: Vec<String> = self.patterns.keys().cloned().collect();
+        let mut patterns: Vec<&String> = self.patterns.keys().collect();
         patterns.sort();
 
         write!(f, "crate").unwrap();
@@ -189,12 +311,10 @@ impl AllStats {
         writeln!(f).unwrap();
         for crt in &self.crates {
             write!(f, "{}", crt).unwrap();
-            for pat in &patterns {
-                let count = self
-                    .crate_patterns
-                    .get(crt)
-                    .and_then(|x| x.get(pat).cloned())
-                    .unwrap_or_default();
+            let crate_patterns = self.crate_patterns.get(crt);
+            for &pat in &patterns {
+                let count =
+                    crate_patterns.and_then(|x| x.get(pat).cloned()).unwrap_or_default();
                 write!(f, ", {}", count).unwrap();
             }
             writeln!(f).unwrap();
@@ -238,69 +358,75 @@ fn main() {
     if !download_loc.exists() {
         fs::create_dir_all(download_loc).expect("Failed to create download location");
     }
+    let downloaded = downloaded_crates(download_loc);
+    if args.cache {
+        fs::create_dir_all(CACHE_DIR).expect("Failed to create cache directory");
+    }
 
-    let mut all_stats = AllStats::new(crates.clone());
-
-    let batch_size = args.num_threads * 5;
-    let num_batches = (num_crates + batch_size - 1) / batch_size;
-    let progress_inc = (num_crates + PROGRESS_INCS - 1) / PROGRESS_INCS;
+    // Output paths
+    let base = Path::new(RESULTS_DIR);
+    let pref = args.output_prefix;
+    let output_all = base.join(pref.to_string() + RESULTS_ALL_SUFFIX);
+    let output_summary = base.join(pref.to_string() + RESULTS_SUMMARY_SUFFIX);
+    let output_pattern = base.join(pref.to_string() + RESULTS_PATTERNS_SUFFIX);
+    let output_metadata = base.join(pref.to_string() + RESULTS_METADATA_SUFFIX);
 
-    for batch in 0..num_batches {
-        let pool = ThreadPool::new(args.num_threads);
-        let (tx, rx) = mpsc::channel();
+    let mut all_stats = AllStats::new(crates.clone());
 
-        let start = batch * batch_size;
-        let end = (batch + 1) * batch_size;
-        let end = if end > num_crates { num_crates } else { end };
-        let batch_crates = &crates[start..end];
+    // Raw effects are written as crates finish, rather than kept until the end
+    if !args.skip_raw {
+        println!("Saving raw effect list to: {}", output_all.to_string_lossy());
+        all_stats.start_raw(&output_all);
+    }
 
-        // Spawn threads
-        for crt in batch_crates {
-            info!("Spawning thread for: {}", crt);
+    let progress_inc = (num_crates + PROGRESS_INCS - 1) / PROGRESS_INCS;
 
-            let tx_inner = tx.clone();
-            let crt = crt.clone();
-            let download_loc = download_loc.to_owned();
-            pool.execute(move || {
-                let res = crate_stats(&crt, download_loc, args.test_run, args.quick_mode);
+    // Downloads are network-bound, so they get their own pool; each crate is
+    // handed over to the scan pool as soon as it is on disk
+    let download_pool = ThreadPool::new(DOWNLOAD_THREADS);
+    let scan_pool = ThreadPool::new(args.num_threads);
+    let (tx, rx) = mpsc::channel();
+
+    // Spawn threads
+    for crt in &crates {
+        info!("Spawning thread for: {}", crt);
+
+        let tx_inner = tx.clone();
+        let crt = crt.clone();
+        let output_dir = download_loc.join(&crt);
+        let already_downloaded = downloaded.contains(&crt);
+        let scan_pool = scan_pool.clone();
+        download_pool.execute(move || {
+            if !args.test_run {
+                download_crate(&crt, &output_dir, already_downloaded);
+            }
+            scan_pool.execute(move || {
+                let res = crate_stats(&crt, output_dir, args.quick_mode, args.cache);
                 if let Err(e) = tx_inner.send((crt, res)) {
                     error!("Error sending result: {:?}", e);
                 }
             });
-        }
+        });
+    }
 
-        // Drop handle
-        drop(tx);
-        // Wait for threads
-        info!("Waiting for threads... (batch {} of {})", batch, num_batches);
-        for (i, (crt, stats)) in rx.iter().enumerate() {
-            all_stats.push_stats(crt, stats);
-            if (start + i + 1) % progress_inc == 0 {
-                println!(
-                    "{:.0}% complete",
-                    ((100 * (start + i + 1)) as f64) / (num_crates as f64)
-                );
-            }
+    // Drop handle
+    drop(tx);
+    // Collect results as they come in
+    info!("Waiting for threads...");
+    for (i, (crt, stats)) in rx.iter().enumerate() {
+        all_stats.push_stats(crt, stats);
+        if (i + 1) % progress_inc == 0 {
+            println!("{:.0}% complete", ((100 * (i + 1)) as f64) / (num_crates as f64));
         }
     }
 
     // dbg!(&all_stats);
 
     // Save Results
-    let base = Path::new(RESULTS_DIR);
-    let pref = args.output_prefix;
-    let output_all = base.join(pref.to_string() + RESULTS_ALL_SUFFIX);
-    let output_summary = base.join(pref.to_string() + RESULTS_SUMMARY_SUFFIX);
-    let output_pattern = base.join(pref.to_string() + RESULTS_PATTERNS_SUFFIX);
-    let output_metadata = base.join(pref.to_string() + RESULTS_METADATA_SUFFIX);
+    all_stats.finish_raw();
 
     println!("Saving summary, patterns, and metadata to: {}", base.to_string_lossy());
     all_stats.dump_summary(&output_summary);
     all_stats.dump_patterns(&output_pattern);
     all_stats.dump_metadata(&output_metadata);
-
-    if !args.skip_raw {
-        println!("Saving raw effect list to: {}", output_all.to_string_lossy());
-        all_stats.dump_all(&output_all);
-    }
 }
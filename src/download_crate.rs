@@ -1,4 +1,4 @@
-use std::fs::{create_dir_all, remove_file, write, File};
+use std::fs::create_dir_all;
 use std::path::PathBuf;
 
 use anyhow::Result;
@@ -36,18 +36,15 @@ fn download_crate(
     }
 
     let package_dir_name = format!("{}-{}", package_name, package_version);
-    let tarball_name = format!("{}.tar.gz", package_dir_name);
     let mut download_dir = PathBuf::from(download_dir);
-    download_dir.push(tarball_name.clone());
-    write(&download_dir, dst)?;
 
     {
-        let tarball_file = File::open(download_dir.clone())?;
-        let tar = GzDecoder::new(tarball_file);
+        // Unpack straight from the downloaded bytes instead of writing the
+        // tarball to disk and reading it back
+        let tar = GzDecoder::new(dst.as_slice());
         let mut archive = Archive::new(tar);
 
         // Set the download_dir to the expected crate download dir
-        download_dir.pop();
         download_dir.push(&package_dir_name);
 
         // if the directory already exists, delete it and use the new version;
@@ -67,10 +64,6 @@ fn download_crate(
         archive.unpack(download_dir.clone())?;
     }
 
-    download_dir.push(tarball_name);
-    remove_file(download_dir.clone())?;
-
-    download_dir.pop();
     download_dir.push(package_dir_name);
 
     Ok(download_dir)
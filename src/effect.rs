@@ -13,6 +13,7 @@ use super::util::csv;
 use log::debug;
 use parse_display::{Display, FromStr};
 use serde::{Deserialize, Serialize};
+use std::borrow::Cow;
 use std::collections::HashSet;
 use std::fmt;
 use std::path::{Path as FilePath, PathBuf as FilePathBuf};
@@ -180,7 +181,9 @@ impl Effect {
         !matches!(self, Self::SinkCall(_) | Self::FnPtrCreation | Self::ClosureCreation)
     }
 
-    fn simple_str(&self) -> &str {
+    /// Short name of the effect type (the pattern, for sink calls).
+    /// Not sanitized for CSV output; see to_csv.
+    pub fn simple_str(&self) -> &str {
         match self {
             Self::SinkCall(s) => s.as_str(),
             Self::FFICall(_) => "[FFI Call]",
@@ -196,7 +199,7 @@ impl Effect {
         }
     }
 
-    pub fn to_csv(&self) -> String {
+    pub fn to_csv(&self) -> Cow<'_, str> {
         csv::sanitize_comma(self.simple_str())
     }
 
@@ -294,7 +297,7 @@ impl EffectInstance {
     /// graph structure.
     pub fn new_call<S>(
         filepath: &FilePath,
-        caller: CanonicalPath,
+        caller: &CanonicalPath,
         callee: CanonicalPath,
         callsite: &S,
         is_unsafe: bool,
@@ -305,7 +308,6 @@ impl EffectInstance {
         S: Spanned,
     {
         // Code to classify an effect based on call site information
-        let call_loc = SrcLoc::from_span(filepath, callsite);
         let eff_type = if let Some(ffi) = ffi {
             if !is_unsafe {
                 // This case can occur in certain contexts, e.g. with
@@ -314,7 +316,9 @@ impl EffectInstance {
                     "Found FFI callsite that wasn't marked unsafe; \
                     classifying as FFICall: \
                     {} ({}) (FFI {:?})",
-                    callee, call_loc, ffi
+                    callee,
+                    SrcLoc::from_span(filepath, callsite),
+                    ffi
                 );
             }
             if Sink::new_match(&callee, sinks).is_some() {
@@ -323,19 +327,24 @@ impl EffectInstance {
                     "Found FFI callsite also matching a sink pattern; \
                     classifying as FFICall: \
                     {} ({}) (FFI {:?})",
-                    callee, call_loc, ffi
+                    callee,
+                    SrcLoc::from_span(filepath, callsite),
+                    ffi
                 );
             }
-            Some(Effect::FFICall(ffi))
+            Effect::FFICall(ffi)
         } else if let Some(pat) = Sink::new_match(&callee, sinks) {
             // callee.remove_src_loc();
-            Some(Effect::SinkCall(pat))
+            Effect::SinkCall(pat)
         } else if is_unsafe {
-            Some(Effect::UnsafeCall(callee.clone()))
+            Effect::UnsafeCall(callee.clone())
         } else {
-            None
+            // Most calls are not effects: bail out before building the
+            // location or copying the caller
+            return None;
         };
-        Some(Self { caller, call_loc, callee, eff_type: eff_type? })
+        let call_loc = SrcLoc::from_span(filepath, callsite);
+        Some(Self { caller: caller.clone(), call_loc, callee, eff_type })
     }
 
     pub fn new_effect<S>(
@@ -378,8 +387,8 @@ impl EffectInstance {
     }
 
     pub fn to_csv(&self) -> String {
-        let crt = self.caller.crate_name().to_string();
-        let caller = self.caller.to_string();
+        let crt = self.caller.crate_name();
+        let caller = self.caller.as_str();
         let callee = csv::sanitize_comma(self.callee.as_str());
         let effect = self.eff_type.to_csv();
         let call_loc_csv = self.call_loc.to_csv();
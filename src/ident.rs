@@ -7,6 +7,7 @@
 
 use log::warn;
 use serde::{Deserialize, Serialize};
+use std::borrow::Borrow;
 use std::fmt::{self, Display};
 
 use crate::effect::SrcLoc;
@@ -14,8 +15,10 @@ use crate::effect::SrcLoc;
 use super::util::iter::FreshIter;
 
 fn replace_hyphens(s: &mut String) {
-    while let Some(i) = s.find('-') {
-        s.replace_range(i..(i + 1), "_");
+    // Single pass over the string; most identifiers have no hyphens and are
+    // left untouched
+    if s.contains('-') {
+        *s = s.replace('-', "_");
     }
 }
 
@@ -217,6 +220,13 @@ impl IdentPath {
     }
 }
 
+// Allows looking up an IdentPath in a HashSet by &str without allocating
+impl Borrow<str> for IdentPath {
+    fn borrow(&self) -> &str {
+        &self.0
+    }
+}
+
 impl Default for IdentPath {
     fn default() -> Self {
         Self::new_empty()
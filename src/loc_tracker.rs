@@ -10,10 +10,11 @@
 //!   may result in an overapproximation as get_loc() counts zero
 //!   sized excerpts as one line each.
 
+use serde::{Deserialize, Serialize};
 use syn::spanned::Spanned;
 
 /// Lines of Code tracker
-#[derive(Debug, Default)]
+#[derive(Debug, Default, Serialize, Deserialize)]
 pub struct LoCTracker {
     instances: usize,
     lines: usize,
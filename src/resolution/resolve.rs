@@ -163,10 +163,14 @@ impl<'a> FileResolver<'a> {
         F: FnOnce() -> T,
     {
         try_resolve().unwrap_or_else(|err| {
-            let s = SrcLoc::from_span(self.filepath, i);
             // Temporarily suppressing this warning.
             // TODO: Bump this back up to warn! once a fix is pushed
-            debug!("Resolution failed (using fallback) for: {} ({}) ({})", i, s, err);
+            debug!(
+                "Resolution failed (using fallback) for: {} ({}) ({})",
+                i,
+                SrcLoc::from_span(self.filepath, i),
+                err
+            );
             fallback()
         })
     }
@@ -280,11 +284,11 @@ impl<'a> Resolve<'a> for FileResolver<'a> {
     }
 
     fn resolve_field_index(&self, idx: &'a syn::Index) -> CanonicalPath {
-        let s = SrcLoc::from_span(self.filepath, idx);
         // TODO: bump back to a warn! once a fix is pushed
         debug!(
             "Skipping function call on a field index (using fallback) for {:?} ({})",
-            idx, s
+            idx,
+            SrcLoc::from_span(self.filepath, idx)
         );
         self.backup.resolve_field_index(idx)
     }
@@ -294,8 +298,11 @@ impl<'a> Resolve<'a> for FileResolver<'a> {
     }
 
     fn resolve_closure(&self, cl: &'a syn::ExprClosure) -> CanonicalPath {
-        let s = SrcLoc::from_span(self.filepath, cl);
-        debug!("Skipping closure resolution (using fallback) for {:?} ({})", cl, s);
+        debug!(
+            "Skipping closure resolution (using fallback) for {:?} ({})",
+            cl,
+            SrcLoc::from_span(self.filepath, cl)
+        );
         self.backup.resolve_closure(cl)
     }
 
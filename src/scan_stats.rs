@@ -13,15 +13,19 @@ use super::scanner::ScanResults;
 
 use anyhow::Result;
 use log::{debug, warn};
+use serde::{Deserialize, Serialize};
 use std::collections::HashSet;
 use std::path::PathBuf;
 
-#[derive(Debug, Default)]
+#[derive(Debug, Default, Serialize, Deserialize)]
 pub struct CrateStats {
     pub crate_path: PathBuf,
 
     // List of effects
     pub effects: Vec<EffectInstance>,
+    // Number of effects -- kept separately so that the list itself can be
+    // dropped once it has been written out
+    pub num_effects: usize,
 
     // Scan metadata
     pub total_loc: LoCTracker,
@@ -60,7 +64,7 @@ impl CrateStats {
     pub fn metadata_csv(&self) -> String {
         format!(
             "{}, {}, {}, {}, {}, {}, {}, {}, {}, {}, {}, {}, {}, {}",
-            self.effects.len(),
+            self.num_effects,
             self.total_loc.as_csv(),
             self.skipped_macros.as_csv(),
             self.skipped_conditional_code.as_csv(),
@@ -79,12 +83,14 @@ impl CrateStats {
 }
 
 pub fn get_crate_stats_default(crate_path: PathBuf, quick_mode: bool) -> CrateStats {
-    get_crate_stats(crate_path.clone(), DEFAULT_EFFECT_TYPES, quick_mode).unwrap_or_else(
-        |_| {
-            warn!("Scan crashed, skipping crate: {}", crate_path.to_string_lossy());
-            CrateStats { crate_path, ..Default::default() }
-        },
-    )
+    get_crate_stats(crate_path.clone(), DEFAULT_EFFECT_TYPES, quick_mode)
+        .unwrap_or_else(|_| crashed_crate_stats(crate_path))
+}
+
+/// Empty stats for a crate whose scan failed
+pub fn crashed_crate_stats(crate_path: PathBuf) -> CrateStats {
+    warn!("Scan crashed, skipping crate: {}", crate_path.to_string_lossy());
+    CrateStats { crate_path, ..Default::default() }
 }
 
 pub fn get_crate_stats(
@@ -113,6 +119,7 @@ pub fn get_crate_stats(
 
     let result = CrateStats {
         crate_path,
+        num_effects: results.effects.len(),
         effects: results.effects,
         total_loc: results.total_loc,
         skipped_macros: results.skipped_macros,
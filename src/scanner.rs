@@ -25,8 +25,7 @@ use quote::ToTokens;
 use std::collections::HashMap;
 use std::collections::HashSet;
 use std::fmt::Debug;
-use std::fs::File;
-use std::io::Read;
+use std::fs;
 use std::path::Path as FilePath;
 use syn::spanned::Spanned;
 use syn::ForeignItemFn;
@@ -153,8 +152,8 @@ where
     /// Target to accumulate scan results
     data: &'a mut ScanResults,
 
-    /// The list of sinks to look for
-    sinks: HashSet<IdentPath>,
+    /// The list of sinks to look for (shared by all files in the crate)
+    sinks: &'a HashSet<IdentPath>,
 
     /// The set of enabled cfg options for this crate.
     enabled_cfg: &'a HashMap<String, Vec<String>>,
@@ -173,6 +172,7 @@ where
         filepath: &'a FilePath,
         resolver: R,
         data: &'a mut ScanResults,
+        sinks: &'a HashSet<IdentPath>,
         enabled_cfg: &'a HashMap<String, Vec<String>>,
     ) -> Self {
         Self {
@@ -183,7 +183,7 @@ where
             scope_assign_lhs: false,
             scope_fns: Vec::new(),
             data,
-            sinks: Sink::default_sinks(),
+            sinks,
             enabled_cfg,
         }
     }
@@ -196,10 +196,6 @@ where
         debug_assert_eq!(self.scope_unsafe_effects, 0);
     }
 
-    pub fn add_sinks(&mut self, new_sinks: HashSet<IdentPath>) {
-        self.sinks.extend(new_sinks);
-    }
-
     /*
         Additional top-level items and modules
 
@@ -300,19 +296,33 @@ where
         Reusable loggers
     */
 
+    // Note: the location is built inside the log macro arguments, so that it
+    // is only computed if the message is actually logged
     fn syn_debug<S: Spanned + Debug>(&self, msg: &str, syn_node: S) {
-        let loc = SrcLoc::from_span(self.filepath, &syn_node);
-        debug!("Scanner: {} ({}) ({:?})", msg, loc, syn_node);
+        debug!(
+            "Scanner: {} ({}) ({:?})",
+            msg,
+            SrcLoc::from_span(self.filepath, &syn_node),
+            syn_node
+        );
     }
 
     fn syn_info<S: Spanned + Debug>(&self, msg: &str, syn_node: S) {
-        let loc = SrcLoc::from_span(self.filepath, &syn_node);
-        info!("Scanner: {} ({}) ({:?})", msg, loc, syn_node);
+        info!(
+            "Scanner: {} ({}) ({:?})",
+            msg,
+            SrcLoc::from_span(self.filepath, &syn_node),
+            syn_node
+        );
     }
 
     fn syn_warning<S: Spanned + Debug>(&self, msg: &str, syn_node: S) {
-        let loc = SrcLoc::from_span(self.filepath, &syn_node);
-        warn!("Scanner: {} ({}) ({:?})", msg, loc, syn_node);
+        warn!(
+            "Scanner: {} ({}) ({:?})",
+            msg,
+            SrcLoc::from_span(self.filepath, &syn_node),
+            syn_node
+        );
     }
 
     /*
@@ -1150,12 +1160,12 @@ where
 
         let Some(eff) = EffectInstance::new_call(
             self.filepath,
-            caller.clone(),
+            caller,
             callee,
             &callee_span,
             is_unsafe,
             ffi,
-            &self.sinks,
+            self.sinks,
         ) else {
             return;
         };
@@ -1226,19 +1236,16 @@ pub fn scan_file_quick(
     crate_name: &str,
     filepath: &FilePath,
     scan_results: &mut ScanResults,
-    sinks: HashSet<IdentPath>,
+    sinks: &HashSet<IdentPath>,
     enabled_cfg: &HashMap<String, Vec<String>>,
 ) -> Result<()> {
-    let mut file = File::open(filepath)?;
-    let mut src = String::new();
-    file.read_to_string(&mut src)?;
+    let src = fs::read_to_string(filepath)?;
     let syntax_tree = syn::parse_file(&src)?;
 
     let hacky_resolver = HackyResolver::new(crate_name, filepath);
 
     let mut scanner =
-        Scanner::new(filepath, hacky_resolver.unwrap(), scan_results, enabled_cfg);
-    scanner.add_sinks(sinks);
+        Scanner::new(filepath, hacky_resolver.unwrap(), scan_results, sinks, enabled_cfg);
 
     scanner.scan_file(&syntax_tree);
 
@@ -1251,23 +1258,28 @@ pub fn scan_file(
     filepath: &FilePath,
     resolver: &Resolver,
     scan_results: &mut ScanResults,
-    sinks: HashSet<IdentPath>,
+    sinks: &HashSet<IdentPath>,
     enabled_cfg: &HashMap<String, Vec<String>>,
 ) -> Result<()> {
     debug!("Scanning file: {:?}", filepath);
 
-    // Load file contents
-    let mut file = File::open(filepath)?;
-    let mut src = String::new();
-    file.read_to_string(&mut src)?;
+    // Load file contents (in one read, with the buffer sized up front)
+    let src = fs::read_to_string(filepath)?;
     let syntax_tree = syn::parse_file(&src)?;
 
+    // Nothing to scan (e.g. an empty or comment-only file): skip setting up
+    // the resolver, which re-parses the file, but still count its lines
+    if syntax_tree.items.is_empty() {
+        scan_results.total_loc.add(&syntax_tree);
+        return Ok(());
+    }
+
     // Initialize resolver
     let file_resolver = FileResolver::new(crate_name, resolver, filepath)?;
 
     // Initialize scanner
-    let mut scanner = Scanner::new(filepath, file_resolver, scan_results, enabled_cfg);
-    scanner.add_sinks(sinks);
+    let mut scanner =
+        Scanner::new(filepath, file_resolver, scan_results, sinks, enabled_cfg);
 
     // Scan file contents
     scanner.scan_file(&syntax_tree);
@@ -1281,7 +1293,7 @@ pub fn try_scan_file(
     filepath: &FilePath,
     resolver: &Resolver,
     scan_results: &mut ScanResults,
-    sinks: HashSet<IdentPath>,
+    sinks: &HashSet<IdentPath>,
     enabled_cfg: &HashMap<String, Vec<String>>,
     quick_mode: bool,
 ) {
@@ -1327,6 +1339,10 @@ pub fn scan_crate_with_sinks(
 
     let enabled_cfg = resolver.get_cfg_options_for_crate(&crate_name).unwrap_or_default();
 
+    // Build the full set of sinks once; every file's scanner borrows it
+    let mut all_sinks = Sink::default_sinks();
+    all_sinks.extend(sinks);
+
     // TODO: For now, only walking through the src dir, but might want to
     //       include others (e.g. might codegen in other dirs)
     // If there is no src_dir, we walk through all .rs files in the crate.
@@ -1345,7 +1361,7 @@ pub fn scan_crate_with_sinks(
             entry.as_path(),
             &resolver,
             &mut scan_results,
-            sinks.clone(),
+            &all_sinks,
             &enabled_cfg,
             quick_mode,
         );
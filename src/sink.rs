@@ -9,6 +9,8 @@ use serde::{Deserialize, Serialize};
 use std::{
     collections::HashSet,
     fmt::{self, Display},
+    iter,
+    sync::OnceLock,
 };
 
 // TODO: Convert these examples to canonical paths
@@ -32,6 +34,11 @@ const SINK_PATTERNS: &[&str] = &[
     "winapi",
 ];
 
+/// Modules that rust-analyzer resolves sink items to, listed with the sink
+/// they are reported under (e.g. std::panic::set_hook is defined in
+/// std::panicking)
+const SINK_ALIASES: &[(&str, &str)] = &[("std::panicking", "std::panic")];
+
 // Removed sink patterns on 2023-11-16
 // "mio::net",
 // "mio::unix",
@@ -56,21 +63,34 @@ impl Display for Sink {
 
 impl Sink {
     /// Get the sink pattern matching a callee.
+    ///
+    /// Looks up each prefix of the callee path (std, std::fs, std::fs::File, ...)
+    /// in the set of sinks, so the cost is one hash lookup per path segment rather
+    /// than one comparison per sink. If several sinks match, the most specific wins.
+    /// Prefixes listed in SINK_ALIASES are looked up as the sink they alias.
     pub fn new_match(callee: &CanonicalPath, sinks: &HashSet<IdentPath>) -> Option<Self> {
-        let mut result = None;
-        for pat_raw in sinks {
-            let pat = Pattern::new(pat_raw.as_str());
-            if callee.matches(&pat) {
+        let path = callee.as_str();
+        let prefix_ends =
+            path.match_indices("::").map(|(i, _)| i).chain(iter::once(path.len()));
+
+        let mut result: Option<&IdentPath> = None;
+        for end in prefix_ends {
+            let prefix = &path[..end];
+            let prefix = SINK_ALIASES
+                .iter()
+                .find(|(alias, _)| *alias == prefix)
+                .map_or(prefix, |(_, sink)| *sink);
+            if let Some(pat) = sinks.get(prefix) {
                 if let Some(x) = result {
                     warn!(
-                    "Found multiple patterns of interest for {} (overwriting {} with {})",
-                    callee, x, pat
-                );
+                        "Found multiple patterns of interest for {} (overwriting {} with {})",
+                        callee, x, pat
+                    );
                 }
                 result = Some(pat)
             }
         }
-        Some(Self(result?))
+        Some(Self(Pattern::from_path(result?.clone())))
     }
 
     pub fn first_ident(&self) -> Option<Ident> {
@@ -83,6 +103,46 @@ impl Sink {
     }
 
     pub fn default_sinks() -> HashSet<IdentPath> {
-        SINK_PATTERNS.iter().map(|x| IdentPath::new(x)).collect::<HashSet<_>>()
+        // Called once per crate scanned; build the set once per process so that
+        // scanning many crates does not re-parse the patterns each time
+        static DEFAULT_SINKS: OnceLock<HashSet<IdentPath>> = OnceLock::new();
+        DEFAULT_SINKS
+            .get_or_init(|| SINK_PATTERNS.iter().map(|x| IdentPath::new(x)).collect())
+            .clone()
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn match_str(callee: &str) -> Option<String> {
+        let sinks = Sink::default_sinks();
+        Sink::new_match(&CanonicalPath::new(callee), &sinks).map(|s| s.to_string())
+    }
+
+    #[test]
+    fn test_sink_match() {
+        assert_eq!(match_str("std::fs::File::open"), Some("std::fs".to_string()));
+        assert_eq!(match_str("std::env"), Some("std::env".to_string()));
+        assert_eq!(match_str("libc::getpid"), Some("libc".to_string()));
+        assert_eq!(match_str("std::panicking::set_hook"), Some("std::panic".to_string()));
+        assert_eq!(match_str("std::vec::Vec::new"), None);
+        assert_eq!(match_str("my_crate::fs::read"), None);
+    }
+
+    #[test]
+    fn test_sink_match_ident_boundary() {
+        assert_eq!(match_str("libc_print::println"), None);
+        assert_eq!(match_str("std::fsx::read"), None);
+    }
+
+    #[test]
+    fn test_sink_match_most_specific() {
+        let mut sinks = Sink::default_sinks();
+        sinks.insert(IdentPath::new("std::fs::File"));
+        let callee = CanonicalPath::new("std::fs::File::open");
+        let pat = Sink::new_match(&callee, &sinks).unwrap();
+        assert_eq!(pat.as_str(), "std::fs::File");
     }
 }
@@ -23,20 +23,25 @@ pub fn init_logging() {
 /// CSV utility functions
 pub mod csv {
     use log::warn;
+    use std::borrow::Cow;
     use std::path::Path;
 
-    pub fn sanitize_comma(s: &str) -> String {
+    /// Remove commas from a CSV field; borrows the input in the usual case
+    /// where there is nothing to remove
+    pub fn sanitize_comma(s: &str) -> Cow<'_, str> {
         if s.contains(',') {
             warn!("Warning: ignoring unexpected comma when generating CSV: {s}");
+            Cow::Owned(s.replace(',', ""))
+        } else {
+            Cow::Borrowed(s)
         }
-        s.replace(',', "")
     }
-    pub fn sanitize_path(p: &Path) -> String {
+    pub fn sanitize_path(p: &Path) -> Cow<'_, str> {
         match p.to_str() {
             Some(s) => sanitize_comma(s),
             None => {
                 warn!("Warning: path is invalid unicode: {:?}", p);
-                sanitize_comma(&p.to_string_lossy())
+                Cow::Owned(sanitize_comma(&p.to_string_lossy()).into_owned())
             }
         }
     }
@@ -78,22 +83,48 @@ pub mod fs {
     use std::path::{Path, PathBuf};
     use walkdir::{DirEntry, WalkDir};
 
-    pub fn walk_files(p: &Path) -> impl Iterator<Item = PathBuf> {
+    /// Directories not worth descending into: hidden directories (.git, ...)
+    /// and Cargo build output (a target directory next to a Cargo.toml).
+    /// The walk root itself is never skipped.
+    fn is_skipped_dir(entry: &DirEntry) -> bool {
+        if entry.depth() == 0 || !entry.file_type().is_dir() {
+            return false;
+        }
+        match entry.file_name().to_str() {
+            Some(name) if name.starts_with('.') => true,
+            Some("target") => entry.path().with_file_name("Cargo.toml").is_file(),
+            _ => false,
+        }
+    }
+
+    fn walk_entries(p: &Path) -> impl Iterator<Item = DirEntry> {
         debug_assert!(p.is_dir());
         WalkDir::new(p)
             .sort_by_file_name()
             .into_iter()
+            .filter_entry(|entry| !is_skipped_dir(entry))
             .filter_map(super::iter::warn_ok)
-            .map(DirEntry::into_path)
+    }
+
+    pub fn walk_files(p: &Path) -> impl Iterator<Item = PathBuf> {
+        walk_entries(p).map(DirEntry::into_path)
     }
 
     pub fn walk_files_with_extension<'a>(
         p: &'a Path,
         ext: &'a str,
     ) -> impl Iterator<Item = PathBuf> + 'a {
-        walk_files(p)
-            .filter(|entry| entry.is_file())
-            .filter(|entry| entry.extension().map_or(false, |x| x.to_str() == Some(ext)))
+        // Check the extension first and use the file type already read by
+        // WalkDir; only symlinks need an extra stat to see what they point to
+        walk_entries(p)
+            .filter(move |entry| {
+                entry.path().extension().map_or(false, |x| x.to_str() == Some(ext))
+            })
+            .filter(|entry| {
+                entry.file_type().is_file()
+                    || (entry.path_is_symlink() && entry.path().is_file())
+            })
+            .map(DirEntry::into_path)
     }
 
     pub fn file_lines(p: &PathBuf) -> impl Iterator<Item = String> {